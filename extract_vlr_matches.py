@@ -1,10 +1,44 @@
 import requests
 from bs4 import BeautifulSoup
+from lxml import etree
 import time
 import re
 import pandas as pd
+import numpy as np
 from urllib.parse import urljoin, urlparse
 import sys
+import os
+import json
+import hashlib
+import gzip
+import argparse
+import cProfile
+import pstats
+import tracemalloc
+import threading
+import glob
+import functools
+import inspect
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+# Bump this whenever the extraction logic changes so cached results are re-parsed
+EXTRACTOR_VERSION = "1"
+PARSED_CACHE_DIR = os.path.join('.vlr_cache', 'parsed')
+PAGES_DIR = os.path.join('.vlr_cache', 'pages')
+
+# Streaming mode: chunk size for iter_content and the element that wraps
+# every .vm-stats-game block (nothing after it is needed for extraction)
+STREAM_CHUNK_SIZE = 16 * 1024
+STATS_CONTAINER_CLASS = 'vm-stats-container'
+
+# Backfill planner defaults
+EVENTS_LISTING_URL = "https://www.vlr.gg/events/"
+BACKFILL_PLAN_FILE = 'backfill_plan.json'
+BACKFILL_OUTPUT_DIR = 'backfill_output'
+TIER1_KEYWORDS = ['champions tour', 'vct', 'valorant masters', 'valorant champions', 'esports world cup']
+# VCT-branded and similarly named events that are not tier-1
+TIER1_EXCLUDE_KEYWORDS = ['challengers', 'game changers', 'ascension', 'vcl', 'academy', 'community']
 
 def get_event_match_urls(event_url):
     """
@@ -90,8 +124,9 @@ def get_user_input():
     print("\n🌐 Event URL Options:")
     print("1. Enter VLR.gg tournament URL (from matches section)")
     print("2. Use pre-defined individual match URLs")
+    print("3. Load match URLs from a file (e.g. a re-scrape queue)")
     
-    choice = input("\nSelect option (1 or 2): ").strip()
+    choice = input("\nSelect option (1, 2 or 3): ").strip()
     
     if choice == "1":
         event_url = input("🔗 Enter VLR.gg tournament URL (must include /matches/): ").strip()
@@ -104,6 +139,14 @@ def get_user_input():
         if not match_urls:
             print("❌ No match URLs found. Please check the event URL.")
             sys.exit(1)
+    
+    elif choice == "3":
+        queue_file = input("📄 Enter path to URL file (one URL per line): ").strip()
+        match_urls = load_url_queue(queue_file)
+        if not match_urls:
+            print("❌ No match URLs found in file.")
+            sys.exit(1)
+        print(f"📋 Loaded {len(match_urls)} match URLs from {queue_file}")
             
     else:
         # Use the pre-defined URLs from the script
@@ -112,6 +155,27 @@ def get_user_input():
     
     return event_name, match_urls
 
+def load_url_queue(path):
+    """Read match URLs from a text file, one per line (blank lines and # comments ignored)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = [line.strip() for line in f]
+    except OSError as e:
+        print(f"❌ Error reading URL file: {e}")
+        return []
+    
+    urls = []
+    for line in lines:
+        if line and not line.startswith('#') and line not in urls:
+            urls.append(line)
+    return urls
+
+def save_url_queue(urls, path):
+    """Write match URLs to a text file, one per line"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for url in urls:
+            f.write(f"{url}\n")
+
 def get_predefined_urls():
     """Return the pre-defined match URLs"""
     return [
@@ -162,9 +226,10 @@ def get_predefined_urls():
         "https://www.vlr.gg/510155/fnatic-vs-team-heretics-esports-world-cup-2025-gf",
     ]
 
-def get_vlr_match_maps(url):
+def get_vlr_match_maps(url, stream=False):
     """
     Scrapes all map results from a vlr.gg match URL
+    With stream=True the download stops as soon as the map stats are complete
     Returns: List of map dictionaries with detailed information
     """
     headers = {
@@ -172,23 +237,211 @@ def get_vlr_match_maps(url):
     }
     
     try:
-        r = requests.get(url, headers=headers, timeout=15)
+        if stream:
+            html = fetch_match_html_streaming(url, headers)
+        else:
+            r = requests.get(url, headers=headers, timeout=15)
+            r.raise_for_status()
+            html = r.text
+        save_raw_page(url, html)
+        return parse_match_html(html, url)
+        
+    except Exception as e:
+        print(f"Error processing {url}: {e}")
+        return []
+
+def fetch_match_html_streaming(url, headers):
+    """
+    Download a match page in chunks, stopping once the map stats block has closed
+    Chunks are fed to an incremental lxml parser; when the element wrapping all
+    .vm-stats-game containers ends, the rest of the page (comments, footer) is
+    never downloaded. Falls back to the full page if that element is missing.
+    Returns: HTML received so far, decoded to text
+    """
+    parser = etree.HTMLPullParser(events=('end',))
+    chunks = []
+    
+    with requests.get(url, headers=headers, timeout=15, stream=True) as r:
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
+        encoding = r.encoding or 'utf-8'
+        stats_done = False
         
-        # Extract basic match info
-        match_info = extract_match_info(soup, url)
-        if not match_info:
-            return []
+        for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            if not chunk:
+                continue
+            chunks.append(chunk)
+            parser.feed(chunk)
+            
+            for _, element in parser.read_events():
+                if STATS_CONTAINER_CLASS in (element.get('class') or '').split():
+                    stats_done = True
+                    break
+            
+            if stats_done:
+                break
+    
+    return b''.join(chunks).decode(encoding, errors='replace')
+
+def get_url_key(url):
+    """File-name-safe key for a URL (one cache file per match page)"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+def get_page_cache_key(html, url):
+    """
+    Build the cache key for a match page
+    Combines the extractor version, the URL and the page HTML so that any
+    change to the page or to the parser produces a new key
+    """
+    digest = hashlib.sha256()
+    digest.update(EXTRACTOR_VERSION.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(url.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(html.encode('utf-8'))
+    return digest.hexdigest()
+
+def write_json_atomic(path, data, compress=False, indent=None):
+    """
+    Write JSON via a temp file so readers never see a half-written file
+    With compress=True the file is gzip-compressed
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    opener = gzip.open if compress else open
+    with opener(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp_path, path)
+
+def read_json_file(path):
+    """Read a JSON file, transparently handling gzip-compressed (.gz) files"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_saved_page_path(url, pages_dir=PAGES_DIR):
+    """Path of the stored copy of a match page"""
+    return os.path.join(pages_dir, f'{get_url_key(url)}.json.gz')
+
+def save_raw_page(url, html, pages_dir=PAGES_DIR):
+    """Store the fetched HTML of a match page, gzip-compressed (latest copy per URL)"""
+    try:
+        write_json_atomic(get_saved_page_path(url, pages_dir), {'url': url, 'html': html}, compress=True)
+    except OSError as e:
+        print(f"  ⚠️ Could not save raw page: {e}")
+
+def load_saved_page(url, pages_dir=PAGES_DIR):
+    """Return the stored HTML for a match URL, or None if it isn't stored or can't be read"""
+    try:
+        return read_json_file(get_saved_page_path(url, pages_dir))['html']
+    except (OSError, EOFError, ValueError, KeyError):
+        return None
+
+def load_saved_pages(pages_dir=PAGES_DIR):
+    """
+    Yield (url, html) for every match page stored by save_raw_page
+    Unreadable entries are skipped with a warning
+    """
+    page_files = glob.glob(os.path.join(pages_dir, '*.json.gz')) + glob.glob(os.path.join(pages_dir, '*.json'))
+    for page_file in sorted(page_files):
+        page = read_saved_page_file(page_file)
+        if page is not None:
+            yield page
+
+def read_saved_page_file(page_file):
+    """
+    Read one page file written by save_raw_page
+    Returns: (url, html), or None with a warning if the file can't be read
+    """
+    try:
+        page = read_json_file(page_file)
+        return page['url'], page['html']
+    except (OSError, EOFError, ValueError, KeyError, TypeError) as e:
+        print(f"  ⚠️ Skipping unreadable saved page {page_file}: {e}")
+        return None
+
+def load_cached_maps(url, cache_key, cache_dir=PARSED_CACHE_DIR):
+    """Return cached map rows for a page, or None if not cached or stale"""
+    cache_path = os.path.join(cache_dir, f'{get_url_key(url)}.json')
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    # The entry is only valid for the exact page content and extractor version
+    if entry.get('cache_key') != cache_key or entry.get('extractor_version') != EXTRACTOR_VERSION:
+        return None
+    
+    return entry.get('maps', [])
+
+def save_cached_maps(url, cache_key, maps_data, cache_dir=PARSED_CACHE_DIR):
+    """
+    Store extracted map rows for a page
+    Entries are stored per URL, so a changed page replaces its old entry
+    instead of adding another file
+    """
+    try:
+        write_json_atomic(os.path.join(cache_dir, f'{get_url_key(url)}.json'), {
+            'extractor_version': EXTRACTOR_VERSION,
+            'cache_key': cache_key,
+            'url': url,
+            'maps': maps_data
+        })
+    except OSError as e:
+        print(f"  ⚠️ Could not write parse cache: {e}")
+
+def prune_parse_cache(cache_dir=PARSED_CACHE_DIR):
+    """
+    Remove parse cache files that are not per-URL entries for the current
+    EXTRACTOR_VERSION (e.g. left over from an older version)
+    Returns: Number of files removed
+    """
+    removed = 0
+    for cache_file in glob.glob(os.path.join(cache_dir, '*')):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            valid = (entry.get('extractor_version') == EXTRACTOR_VERSION and
+                     'cache_key' in entry and
+                     os.path.basename(cache_file) == f"{get_url_key(entry.get('url', ''))}.json")
+        except (OSError, ValueError, AttributeError):
+            valid = False
         
+        if not valid:
+            try:
+                os.remove(cache_file)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+def parse_match_html(html, url, use_cache=True):
+    """
+    Extract all map results from a match page's HTML
+    Results are memoized on disk by page content hash and EXTRACTOR_VERSION,
+    so unchanged pages skip parsing entirely
+    Returns: List of map dictionaries with detailed information
+    """
+    cache_key = get_page_cache_key(html, url) if use_cache else None
+    if cache_key:
+        cached_maps = load_cached_maps(url, cache_key)
+        if cached_maps is not None:
+            return cached_maps
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Extract basic match info
+    match_info = extract_match_info(soup, url)
+    if not match_info:
+        maps_data = []
+    else:
         # Extract individual map results
         maps_data = extract_map_results(soup, match_info, url)
-        
-        return maps_data
-        
-    except Exception as e:
-        print(f"Error processing {url}: {e}")
-        return []
+    
+    if cache_key:
+        save_cached_maps(url, cache_key, maps_data)
+    
+    return maps_data
 
 def extract_match_info(soup, url):
     """Extract basic match information"""
@@ -640,13 +893,12 @@ def extract_maps_alternative_method(soup, match_info, url):
     
     return maps_data
 
-def main():
-    # Get user input for event name and URLs
-    event_name, match_urls = get_user_input()
-    
-    print(f"\n🎮 Processing {len(match_urls)} matches for event: {event_name}")
-    print("=" * 60)
-    
+def scrape_matches(match_urls, stream=False, failed_urls=None):
+    """
+    Fetch and extract maps for a list of match URLs
+    URLs that yield no valid maps are appended to failed_urls if a list is given
+    Returns: List of map dictionaries for all matches
+    """
     all_maps_data = []
     successful_matches = 0
     total_maps = 0
@@ -654,7 +906,7 @@ def main():
     for i, url in enumerate(match_urls, 1):
         print(f"\n[{i}/{len(match_urls)}] Processing: {url.split('/')[-1]}")
         
-        maps_data = get_vlr_match_maps(url)
+        maps_data = get_vlr_match_maps(url, stream)
         
         if maps_data:
             successful_matches += 1
@@ -671,6 +923,8 @@ def main():
             validate_series_completeness(maps_data, url)
         else:
             print("  ❌ No valid maps found")
+            if failed_urls is not None:
+                failed_urls.append(url)
         
         # Be respectful with requests
         time.sleep(2)
@@ -679,117 +933,1097 @@ def main():
     print(f"✅ Successfully processed {successful_matches}/{len(match_urls)} matches")
     print(f"📊 Total maps extracted: {total_maps}")
     
-    if all_maps_data:
-        # Create DataFrame
-        df = pd.DataFrame(all_maps_data)
-        
-        # Reorder columns for better readability
-        column_order = [
-            'tournament', 'match_type', 'date', 'team_A', 'team_B', 
-            'map_number', 'map_name', 'duration',
-            'team_A_score', 'team_B_score', 'winner', 'team_A_won', 'team_B_won', 'url'
-        ]
-        
-        # Only include columns that exist in the dataframe
-        available_columns = [col for col in column_order if col in df.columns]
-        df = df[available_columns]
-        
-        # Generate filenames with event name
-        safe_event_name = "".join(c for c in event_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        safe_event_name = safe_event_name.replace(' ', '_')
-        
-        csv_filename = f'{safe_event_name}_match_maps.csv'
-        excel_filename = f'{safe_event_name}_match_maps.xlsx'
-        
-        # Save to CSV
-        df.to_csv(csv_filename, index=False)
-        print(f"💾 Saved to {csv_filename}")
-        
-        # Save to Excel
-        with pd.ExcelWriter(excel_filename, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='All Maps', index=False)
-            
-            # Create summary sheet
-            summary_df = create_summary_stats(df)
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
-        
-        print(f"📊 Saved to {excel_filename}")
+    return all_maps_data
+
+def get_safe_event_name(event_name):
+    """Turn an event name into a file-name-safe prefix"""
+    safe_event_name = "".join(c for c in event_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    return safe_event_name.replace(' ', '_')
+
+def load_existing_maps(csv_filename, scraped_urls):
+    """
+    Load an event's saved maps, minus the rows for matches that were just re-scraped
+    Returns: List of map dictionaries (empty if there is no usable saved CSV)
+    """
+    if not os.path.exists(csv_filename):
+        return []
+    
+    try:
+        existing_df = pd.read_csv(csv_filename)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read existing {csv_filename} ({e}), it will be replaced")
+        return []
+    
+    if 'url' not in existing_df.columns:
+        return []
+    
+    kept_df = existing_df[~existing_df['url'].isin(set(scraped_urls))]
+    return kept_df.to_dict('records')
+
+def save_event_data(all_maps_data, event_name, output_dir='.', scraped_urls=None):
+    """
+    Save extracted maps to CSV and Excel (with summary sheet) and run batch validation
+    If scraped_urls is given, the results are merged into the event's existing
+    CSV: saved rows for those URLs are replaced and all other rows are kept
+    Returns: DataFrame of saved maps, or None if there was nothing to save
+    """
+    file_prefix = os.path.join(output_dir, get_safe_event_name(event_name))
+    csv_filename = f'{file_prefix}_match_maps.csv'
+    excel_filename = f'{file_prefix}_match_maps.xlsx'
+    
+    if scraped_urls is not None:
+        existing_maps = load_existing_maps(csv_filename, scraped_urls)
+        if existing_maps:
+            print(f"🔀 Merging with {len(existing_maps)} existing maps from {csv_filename}")
+        all_maps_data = existing_maps + list(all_maps_data)
+    
+    if not all_maps_data:
+        print("❌ No data extracted!")
+        return None
+    
+    # Create DataFrame
+    df = pd.DataFrame(all_maps_data)
+    
+    # Reorder columns for better readability
+    column_order = [
+        'tournament', 'match_type', 'date', 'team_A', 'team_B', 
+        'map_number', 'map_name', 'duration',
+        'team_A_score', 'team_B_score', 'winner', 'team_A_won', 'team_B_won', 'url'
+    ]
+    
+    # Only include columns that exist in the dataframe
+    available_columns = [col for col in column_order if col in df.columns]
+    df = df[available_columns]
+    
+    # Save to CSV (via a temp file so readers like the query service never see a partial file)
+    tmp_csv_filename = csv_filename + '.tmp'
+    df.to_csv(tmp_csv_filename, index=False)
+    os.replace(tmp_csv_filename, csv_filename)
+    print(f"💾 Saved to {csv_filename}")
+    
+    # Save to Excel
+    with pd.ExcelWriter(excel_filename, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='All Maps', index=False)
         
+        # Create summary sheet
+        summary_df = create_summary_stats(df)
+        summary_df.to_excel(writer, sheet_name='Summary', index=False)
+    
+    print(f"📊 Saved to {excel_filename}")
+    
+    # Audit the whole dataset and queue flagged matches for re-scraping
+    report_anomalies(df, file_prefix)
+    
+    return df
+
+def main(stream=False):
+    # Get user input for event name and URLs
+    event_name, match_urls = get_user_input()
+    
+    print(f"\n🎮 Processing {len(match_urls)} matches for event: {event_name}")
+    print("=" * 60)
+    
+    all_maps_data = scrape_matches(match_urls, stream)
+    df = save_event_data(all_maps_data, event_name, scraped_urls=match_urls)
+    
+    if df is not None:
         # Print sample of the data
         print(f"\n📋 Sample of extracted data:")
         print(df.head().to_string())
-        
-        return df
-    else:
-        print("❌ No data extracted!")
+    
+    return df
+
+def rebuild_from_saved_pages(event_name, url_file, pages_dir=PAGES_DIR):
+    """
+    Rebuild an event's dataset from stored match pages without any network requests
+    Only the match URLs listed in url_file are used, so pages stored by other
+    events never end up in this event's output. Pages go through the cached
+    parse_match_html, so only pages that changed (or all pages, after an
+    EXTRACTOR_VERSION bump) are parsed again
+    Returns: DataFrame of saved maps, or None if there was nothing to save
+    """
+    match_urls = load_url_queue(url_file)
+    if not match_urls:
+        print(f"❌ No match URLs found in {url_file}")
         return None
+    
+    removed = prune_parse_cache()
+    if removed:
+        print(f"🧹 Removed {removed} stale parse cache entries")
+    
+    all_maps_data = []
+    missing_urls = []
+    for url in match_urls:
+        html = load_saved_page(url, pages_dir)
+        if html is None:
+            missing_urls.append(url)
+            continue
+        all_maps_data.extend(parse_match_html(html, url))
+    
+    print(f"🔁 Rebuilt {len(all_maps_data)} maps from {len(match_urls) - len(missing_urls)} saved pages")
+    if missing_urls:
+        print(f"⚠️ {len(missing_urls)} URLs have no stored page (scrape them first):")
+        for url in missing_urls[:5]:
+            print(f"  {url}")
+    
+    return save_event_data(all_maps_data, event_name, scraped_urls=match_urls)
+
+# Maps needed to win a series for each match format
+SERIES_WINS_NEEDED = {'Bo1': 1, 'Bo3': 2, 'Bo5': 3}
 
 def validate_series_completeness(maps_data, url):
-    """Validate if a series has the expected number of maps"""
+    """
+    Check a single series result against its match_type
+    Uses the same SERIES_WINS_NEEDED rules as the series_result check in validate_dataset()
+    """
     if not maps_data:
         return
     
-    num_maps = len(maps_data)
-    match_type = maps_data[0].get('match_type', '').lower()
+    match_type = maps_data[0].get('match_type')
+    team_a_wins = sum(m['team_A_won'] for m in maps_data)
+    team_b_wins = sum(m['team_B_won'] for m in maps_data)
+    needed = SERIES_WINS_NEEDED.get(match_type)
     
-    # Count wins for each team
-    team_a = maps_data[0]['team_A']
-    team_b = maps_data[0]['team_B']
-    team_a_wins = sum(1 for m in maps_data if m['winner'] == team_a)
-    team_b_wins = sum(1 for m in maps_data if m['winner'] == team_b)
-    
-    # Validate based on series format
-    if num_maps == 1:
-        # Bo1 is always complete
-        return
-    elif num_maps == 2:
-        # Bo3 that ended 2-0
-        if team_a_wins == 2 or team_b_wins == 2:
-            print(f"    ✅ Complete Bo3 series (2-0)")
-        else:
-            print(f"    ⚠️ Incomplete Bo3: Found 2 maps but neither team won 2")
-    elif num_maps == 3:
-        # Bo3 that went full distance
-        if (team_a_wins == 2 and team_b_wins == 1) or (team_a_wins == 1 and team_b_wins == 2):
-            print(f"    ✅ Complete Bo3 series (2-1)")
-        else:
-            print(f"    ⚠️ Unexpected Bo3 result: {team_a_wins}-{team_b_wins}")
-    elif num_maps == 4:
-        # Bo5 that ended 3-1
-        if team_a_wins == 3 or team_b_wins == 3:
-            print(f"    ✅ Complete Bo5 series (3-1)")
-        else:
-            print(f"    ⚠️ Incomplete Bo5: Found 4 maps but no team won 3")
-    elif num_maps == 5:
-        # Bo5 that went full distance
-        if (team_a_wins == 3 and team_b_wins == 2) or (team_a_wins == 2 and team_b_wins == 3):
-            print(f"    ✅ Complete Bo5 series (3-2)")
-        else:
-            print(f"    ⚠️ Unexpected Bo5 result: {team_a_wins}-{team_b_wins}")
+    if needed is None:
+        print(f"    ⚠️ Unknown match type: {match_type}")
+    elif max(team_a_wins, team_b_wins) == needed and min(team_a_wins, team_b_wins) < needed:
+        print(f"    ✅ Complete {match_type} series ({team_a_wins}-{team_b_wins})")
     else:
-        print(f"    ⚠️ Unusual series length: {num_maps} maps")
+        print(f"    ⚠️ Unexpected {match_type} result: {team_a_wins}-{team_b_wins}")
+
+def as_text(values):
+    """
+    Format a column for anomaly messages
+    Whole numbers lose their trailing .0 and missing values become '?'
+    """
+    numeric = pd.to_numeric(values, errors='coerce')
+    text = values.astype('string')
+    whole = numeric.notna() & np.isfinite(numeric) & (numeric == numeric.round())
+    text[whole] = numeric[whole].astype('int64').astype('string')
+    return text.fillna('?')
+
+def validate_dataset(df):
+    """
+    Validate a whole map-level dataset in one vectorized pass
+    Checks score legality, overtime margins, series win counts vs match_type,
+    duplicate maps and missing map numbers
+    Returns: DataFrame of anomalies (url, map_number, check, detail)
+    """
+    anomaly_columns = ['url', 'map_number', 'check', 'detail']
+    if df.empty:
+        return pd.DataFrame(columns=anomaly_columns)
+    
+    anomalies = []
+    
+    def flag(rows, check, detail):
+        if rows.empty:
+            return
+        anomalies.append(pd.DataFrame({
+            'url': rows['url'].values,
+            'map_number': rows['map_number'].values,
+            'check': check,
+            'detail': detail.values if isinstance(detail, pd.Series) else detail
+        }))
+    
+    score_a = pd.to_numeric(df['team_A_score'], errors='coerce')
+    score_b = pd.to_numeric(df['team_B_score'], errors='coerce')
+    high = np.maximum(score_a, score_b)
+    low = np.minimum(score_a, score_b)
+    score_text = as_text(df['team_A_score']) + '-' + as_text(df['team_B_score'])
+    
+    # Score legality (is_valid_valorant_score rules, except that overtime
+    # margins are reported separately as overtime_margin below)
+    in_range = score_a.between(0, 30) & score_b.between(0, 30)
+    regulation = (high == 13) & (low <= 12)
+    overtime = high > 13
+    illegal = ~in_range | ~(regulation | overtime)
+    flag(df[illegal], 'illegal_score', 'score ' + score_text[illegal])
+    
+    # Overtime maps must be won by exactly 2 rounds
+    bad_margin = in_range & overtime & ((high - low) != 2)
+    flag(df[bad_margin], 'overtime_margin', 'overtime score ' + score_text[bad_margin])
+    
+    # Duplicate map numbers and map names within a match
+    dup_number = df.duplicated(['url', 'map_number'], keep='first')
+    flag(df[dup_number], 'duplicate_map_number', 'map number appears more than once')
+    dup_name = df.duplicated(['url', 'map_name'], keep='first') & ~dup_number
+    flag(df[dup_name], 'duplicate_map', 'map ' + as_text(df.loc[dup_name, 'map_name']) + ' played twice')
+    
+    # Series-level checks
+    series = df.groupby('url', sort=False).agg(
+        match_type=('match_type', 'first'),
+        maps=('map_number', 'nunique'),
+        max_map=('map_number', 'max'),
+        a_wins=('team_A_won', 'sum'),
+        b_wins=('team_B_won', 'sum'),
+    ).reset_index()
+    series['map_number'] = None
+    
+    missing = series['max_map'] != series['maps']
+    flag(series[missing], 'missing_map_number',
+         'maps numbered up to ' + as_text(series.loc[missing, 'max_map']) +
+         ' but only ' + as_text(series.loc[missing, 'maps']) + ' found')
+    
+    needed = series['match_type'].map(SERIES_WINS_NEEDED)
+    top = np.maximum(series['a_wins'], series['b_wins'])
+    bottom = np.minimum(series['a_wins'], series['b_wins'])
+    wrong_result = needed.notna() & ((top != needed) | (bottom >= needed))
+    flag(series[wrong_result], 'series_result',
+         as_text(series.loc[wrong_result, 'match_type']) + ' ended ' +
+         as_text(series.loc[wrong_result, 'a_wins']) + '-' +
+         as_text(series.loc[wrong_result, 'b_wins']))
+    
+    unknown_type = needed.isna()
+    flag(series[unknown_type], 'unknown_match_type',
+         'match_type ' + as_text(series.loc[unknown_type, 'match_type']))
+    
+    if not anomalies:
+        return pd.DataFrame(columns=anomaly_columns)
+    
+    return pd.concat(anomalies, ignore_index=True)[anomaly_columns]
+
+def get_rescrape_urls(anomalies_df):
+    """Return the unique match URLs flagged in an anomaly table"""
+    if anomalies_df.empty:
+        return []
+    return list(anomalies_df['url'].drop_duplicates())
+
+def report_anomalies(df, file_prefix):
+    """
+    Run batch validation, save the anomaly table and a re-scrape queue
+    Returns: Anomaly DataFrame
+    """
+    anomalies_df = validate_dataset(df)
+    
+    anomalies_filename = f'{file_prefix}_anomalies.csv'
+    queue_filename = f'{file_prefix}_rescrape_urls.txt'
+    
+    if anomalies_df.empty:
+        # Drop reports from earlier runs so fixed matches leave the re-scrape queue
+        for stale_filename in (anomalies_filename, queue_filename):
+            if os.path.exists(stale_filename):
+                os.remove(stale_filename)
+                print(f"🧹 Removed stale {stale_filename}")
+        print("✅ Batch validation passed: no anomalies found")
+        return anomalies_df
+    
+    anomalies_df.to_csv(anomalies_filename, index=False)
+    rescrape_urls = get_rescrape_urls(anomalies_df)
+    save_url_queue(rescrape_urls, queue_filename)
+    
+    print(f"⚠️ Batch validation found {len(anomalies_df)} anomalies in {len(rescrape_urls)} matches:")
+    print(anomalies_df['check'].value_counts().to_string())
+    print(f"💾 Saved anomaly report to {anomalies_filename}")
+    print(f"📋 Saved re-scrape queue to {queue_filename}")
+    
+    return anomalies_df
+
+def validate_csv(csv_path):
+    """Run batch validation over a previously saved map CSV"""
+    print(f"🔍 Validating {csv_path}")
+    try:
+        df = pd.read_csv(csv_path)
+    except (OSError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        print(f"❌ Error reading {csv_path}: {e}")
+        return None
+    
+    missing_columns = [col for col in ('url', 'map_number', 'map_name', 'match_type', 'team_A_score',
+                                       'team_B_score', 'team_A_won', 'team_B_won') if col not in df.columns]
+    if missing_columns:
+        print(f"❌ {csv_path} is missing columns: {', '.join(missing_columns)}")
+        return None
+    
+    # Use the same prefix as the scraping run so reports land in the same files
+    file_prefix = os.path.splitext(csv_path)[0]
+    if file_prefix.endswith('_match_maps'):
+        file_prefix = file_prefix[:-len('_match_maps')]
+    return report_anomalies(df, file_prefix)
+
+def get_team_sides(df):
+    """
+    Stack the team_A and team_B sides of every map into one frame
+    Returns: DataFrame with one row per (map, team): team, map_name, winner, won
+    """
+    sides = [
+        df[['team_A', 'map_name', 'winner', 'team_A_won']].rename(columns={'team_A': 'team', 'team_A_won': 'won'}),
+        df[['team_B', 'map_name', 'winner', 'team_B_won']].rename(columns={'team_B': 'team', 'team_B_won': 'won'}),
+    ]
+    return pd.concat(sides, ignore_index=True)
+
+def to_records(df):
+    """DataFrame rows as plain dicts, with missing values as None instead of NaN"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def compute_team_records(df, team=None):
+    """
+    Aggregate map records for every team (or just one team)
+    Returns: List of dicts (team, maps_played, maps_won, maps_lost, win_rate)
+    """
+    team_maps = get_team_sides(df)
+    if team is not None:
+        team_maps = team_maps[team_maps['team'] == team]
+    
+    team_maps = team_maps.assign(map_won=(team_maps['winner'] == team_maps['team']).astype(int),
+                                 map_drawn=(team_maps['winner'] == 'Draw').astype(int))
+    records = team_maps.groupby('team').agg(maps_played=('map_won', 'size'),
+                                           maps_won=('map_won', 'sum'),
+                                           maps_drawn=('map_drawn', 'sum')).reset_index()
+    records['maps_lost'] = records['maps_played'] - records['maps_won'] - records['maps_drawn']
+    records['win_rate'] = (records['maps_won'] / records['maps_played'] * 100).round(1)
+    records = records.sort_values('maps_won', ascending=False, kind='stable')
+    
+    return to_records(records[['team', 'maps_played', 'maps_won', 'maps_lost', 'win_rate']])
 
 def create_summary_stats(df):
     """Create summary statistics"""
     summary_data = []
     
-    # Team statistics
-    teams = set(df['team_A'].unique()) | set(df['team_B'].unique())
+    for record in compute_team_records(df):
+        summary_data.append({
+            'Team': record['team'],
+            'Maps Played': record['maps_played'],
+            'Maps Won': record['maps_won'],
+            'Maps Lost': record['maps_lost'],
+            'Win Rate': f"{record['win_rate']:.1f}%"
+        })
+    
+    return pd.DataFrame(summary_data, columns=['Team', 'Maps Played', 'Maps Won', 'Maps Lost', 'Win Rate'])
+
+def start_stack_sampler(thread_id, interval=0.005):
+    """
+    Periodically sample the call stack of a thread in the background
+    Returns: (stop_event, sampler_thread, stack_counts) where stack_counts maps
+    stacks (tuples of code objects, innermost first) to sample counts.
+    Stacks are kept as code objects rather than strings so the sampler only
+    allocates memory for each distinct stack; see collapse_stacks()
+    """
+    stack_counts = {}
+    stop_event = threading.Event()
+    
+    def sample():
+        while not stop_event.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            
+            stack = tuple(stack)
+            stack_counts[stack] = stack_counts.get(stack, 0) + 1
+    
+    sampler_thread = threading.Thread(target=sample, daemon=True)
+    sampler_thread.start()
+    return stop_event, sampler_thread, stack_counts
+
+def collapse_stacks(stack_counts):
+    """
+    Convert sampled stacks to collapsed-stack lines ("outer;inner;leaf count")
+    Returns: List of lines, most frequent first
+    """
+    lines = []
+    for stack, count in sorted(stack_counts.items(), key=lambda item: item[1], reverse=True):
+        names = [f"{os.path.basename(code.co_filename)}:{code.co_name}" for code in reversed(stack)]
+        lines.append(f"{';'.join(names)} {count}")
+    return lines
+
+def get_profiler_allocation_filters():
+    """
+    tracemalloc filters that hide the profiler's own allocations
+    Drops anything allocated by the sampler thread and allocations made
+    directly in run_with_profiling (cProfile bookkeeping, report building)
+    """
+    module_file = os.path.abspath(__file__)
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    
+    source_lines, first_line = inspect.getsourcelines(start_stack_sampler)
+    for lineno in range(first_line, first_line + len(source_lines)):
+        filters.append(tracemalloc.Filter(False, module_file, lineno, all_frames=True))
     
-    for team in teams:
-        team_maps = df[(df['team_A'] == team) | (df['team_B'] == team)]
-        wins = len(team_maps[team_maps['winner'] == team])
-        losses = len(team_maps[team_maps['winner'] != team]) - len(team_maps[team_maps['winner'] == 'Draw'])
+    source_lines, first_line = inspect.getsourcelines(run_with_profiling)
+    for lineno in range(first_line, first_line + len(source_lines)):
+        filters.append(tracemalloc.Filter(False, module_file, lineno))
+    
+    return filters
+
+def get_hot_functions(profiler):
+    """
+    Rank this module's functions (plus BeautifulSoup construction) by cumulative time
+    Returns: List of dicts sorted by cumulative seconds
+    """
+    module_file = os.path.abspath(__file__)
+    stats = pstats.Stats(profiler)
+    hot_functions = []
+    
+    for (filename, line, func_name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        if os.path.abspath(filename) == module_file:
+            label = func_name
+        elif func_name == '__init__' and filename.replace('\\', '/').endswith('bs4/__init__.py'):
+            label = 'BeautifulSoup.__init__'
+        else:
+            continue
         
-        summary_data.append({
-            'Team': team,
-            'Maps Played': len(team_maps),
-            'Maps Won': wins,
-            'Maps Lost': losses,
-            'Win Rate': f"{(wins / len(team_maps) * 100):.1f}%" if len(team_maps) > 0 else "0.0%"
+        hot_functions.append({
+            'function': label,
+            'line': line,
+            'calls': calls,
+            'own_seconds': tottime,
+            'cumulative_seconds': cumtime
         })
     
-    return pd.DataFrame(summary_data).sort_values('Maps Won', ascending=False)
+    return sorted(hot_functions, key=lambda f: f['cumulative_seconds'], reverse=True)
+
+def replay_cached_pages(paths):
+    """
+    Re-parse saved match pages without touching the network or parse cache
+    Accepts .html files, pages stored by save_raw_page (.json.gz) and
+    directories of either; with no paths the stored pages in PAGES_DIR are
+    replayed. Unreadable page files are skipped
+    Returns: DataFrame of extracted maps
+    """
+    pages = []
+    for path in paths or [PAGES_DIR]:
+        if os.path.isdir(path):
+            html_files = sorted(glob.glob(os.path.join(path, '*.html')))
+            pages.extend(load_saved_pages(path))
+        elif path.endswith('.html'):
+            html_files = [path]
+        else:
+            html_files = []
+            page = read_saved_page_file(path)
+            if page is not None:
+                pages.append(page)
+        
+        for html_file in html_files:
+            with open(html_file, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append((os.path.splitext(html_file)[0], f.read()))
+    
+    print(f"🔁 Replaying {len(pages)} saved pages")
+    
+    all_maps_data = []
+    for url, html in pages:
+        all_maps_data.extend(parse_match_html(html, url, use_cache=False))
+    
+    df = pd.DataFrame(all_maps_data)
+    print(f"📊 Total maps extracted: {len(df)}")
+    if not df.empty:
+        # Only run so the summary aggregation shows up in the profile;
+        # replays don't write any output files
+        create_summary_stats(df)
+    return df
+
+def run_with_profiling(target, output_prefix='profile', top_n=20):
+    """
+    Run target() under cProfile, tracemalloc and a stack sampler
+    Writes <prefix>_report.txt (ranked hot functions and top allocations),
+    <prefix>_stacks.folded (collapsed stacks for flamegraph tools) and
+    <prefix>.prof (raw pstats data)
+    """
+    # Set up the profiler and sampler before tracing starts so their own
+    # allocations are not reported as scraper hot spots
+    profiler = cProfile.Profile()
+    stop_event, sampler_thread, stack_counts = start_stack_sampler(threading.get_ident())
+    allocation_filters = get_profiler_allocation_filters()
+    tracemalloc.start(25)
+    
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        result = target()
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        sampler_thread.join()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    
+    # Ranked report
+    module_file = os.path.abspath(__file__)
+    hot_functions = get_hot_functions(profiler)
+    allocation_stats = snapshot.filter_traces(allocation_filters).statistics('lineno')
+    
+    report_lines = [
+        f"Wall time: {elapsed:.3f}s",
+        f"Peak traced memory: {peak_memory / 1024 / 1024:.2f} MiB",
+        "",
+        "Hot functions (by cumulative time):",
+        f"{'cumulative_s':>12} {'own_s':>10} {'calls':>8}  function",
+    ]
+    for func in hot_functions[:top_n]:
+        report_lines.append(
+            f"{func['cumulative_seconds']:>12.4f} {func['own_seconds']:>10.4f} {func['calls']:>8}  "
+            f"{func['function']} (line {func['line']})"
+        )
+    
+    report_lines.extend(["", "Top allocations (by size):"])
+    for stat in allocation_stats[:top_n]:
+        frame = stat.traceback[0]
+        marker = '*' if os.path.abspath(frame.filename) == module_file else ' '
+        report_lines.append(
+            f"{stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks {marker} {frame.filename}:{frame.lineno}"
+        )
+    
+    report_filename = f'{output_prefix}_report.txt'
+    stacks_filename = f'{output_prefix}_stacks.folded'
+    prof_filename = f'{output_prefix}.prof'
+    
+    with open(report_filename, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(report_lines) + '\n')
+    
+    with open(stacks_filename, 'w', encoding='utf-8') as f:
+        for line in collapse_stacks(stack_counts):
+            f.write(f"{line}\n")
+    
+    profiler.dump_stats(prof_filename)
+    
+    print("\n" + "=" * 60)
+    print('\n'.join(report_lines[:5 + min(top_n, len(hot_functions))]))
+    print(f"\n⏱️ Saved profile report to {report_filename}")
+    print(f"🔥 Saved collapsed stacks to {stacks_filename}")
+    print(f"💾 Saved raw profile to {prof_filename}")
+    
+    return result
+
+def crawl_events_listing(max_pages=10):
+    """
+    Crawl the VLR.gg events listing and collect every event found
+    Returns: List of event dicts in listing order (most recent first)
+    """
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    base_url = "https://www.vlr.gg"
+    events = []
+    seen_ids = set()
+    
+    for page in range(1, max_pages + 1):
+        page_url = f"{EVENTS_LISTING_URL}?page={page}"
+        print(f"🌐 Fetching events page {page}: {page_url}")
+        
+        try:
+            r = requests.get(page_url, headers=headers, timeout=15)
+            r.raise_for_status()
+        except Exception as e:
+            print(f"❌ Error fetching events page: {e}")
+            break
+        
+        soup = BeautifulSoup(r.text, 'html.parser')
+        
+        # Event cards first, then any plain event link as a fallback
+        links = soup.select('a.event-item') or soup.select('a[href^="/event/"]')
+        new_events = 0
+        
+        for link in links:
+            href = link.get('href')
+            if not href or not isinstance(href, str):
+                continue
+            
+            event_match = re.match(r'^/event/(\d+)/([^/?#]+)', href)
+            if not event_match:
+                continue
+            
+            event_id, slug = event_match.groups()
+            if event_id in seen_ids:
+                continue
+            seen_ids.add(event_id)
+            
+            title_element = link.select_one('.event-item-title')
+            status_element = link.select_one('.event-item-desc-item-status')
+            dates_element = link.select_one('.event-item-desc-item.mod-dates')
+            
+            name = title_element.get_text(strip=True) if title_element else slug.replace('-', ' ').title()
+            
+            events.append({
+                'event_id': event_id,
+                'name': name,
+                'status': status_element.get_text(strip=True).lower() if status_element else 'unknown',
+                'dates': dates_element.get_text(' ', strip=True) if dates_element else '',
+                'event_url': urljoin(base_url, f"/event/{event_id}/{slug}"),
+                'matches_url': get_event_matches_url(event_id, slug),
+            })
+            new_events += 1
+        
+        print(f"  ✅ Found {new_events} new events")
+        if new_events == 0:
+            break
+        
+        # Be respectful with requests
+        time.sleep(2)
+    
+    return events
+
+def get_event_matches_url(event_id, slug):
+    """Build the completed-matches URL for an event (the URL the README asks users to copy)"""
+    return f"https://www.vlr.gg/event/matches/{event_id}/{slug}/?series_id=all&group=completed"
+
+def is_tier1_event(name):
+    """Check whether an event name looks like a tier-1 (VCT / international) event"""
+    lowered = name.lower()
+    if any(keyword in lowered for keyword in TIER1_EXCLUDE_KEYWORDS):
+        return False
+    return any(keyword in lowered for keyword in TIER1_KEYWORDS)
+
+def get_event_output_prefix(event, output_dir=BACKFILL_OUTPUT_DIR):
+    """File prefix used for all output files of a backfilled event"""
+    event_name = f"{event['event_id']} {event['name']}"
+    return os.path.join(output_dir, get_safe_event_name(event_name))
+
+def get_event_output_csv(event, output_dir=BACKFILL_OUTPUT_DIR):
+    """Path of the map CSV a backfilled event is saved to"""
+    return f"{get_event_output_prefix(event, output_dir)}_match_maps.csv"
+
+def get_event_retry_urls_file(event, output_dir=BACKFILL_OUTPUT_DIR):
+    """Path of the queue of match URLs to retry for a backfilled event (failed or flagged)"""
+    return f"{get_event_output_prefix(event, output_dir)}_retry_urls.txt"
+
+def load_backfill_plan(plan_path=BACKFILL_PLAN_FILE):
+    """Load a saved backfill plan, or return an empty plan"""
+    try:
+        with open(plan_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'events': []}
+
+def save_backfill_plan(plan, plan_path=BACKFILL_PLAN_FILE):
+    """Write a backfill plan atomically so an interrupted run can resume"""
+    write_json_atomic(plan_path, plan, indent=2)
+
+def build_backfill_plan(max_pages=10, plan_path=BACKFILL_PLAN_FILE, output_dir=BACKFILL_OUTPUT_DIR):
+    """
+    Crawl the events listing and merge it into a prioritized backfill plan
+    Tier-1 events come first, then the most recent; pending events whose
+    output already exists are marked done. Existing progress in the plan
+    (including partial and failed events) is kept.
+    Returns: The saved plan
+    """
+    plan = load_backfill_plan(plan_path)
+    planned = {event['event_id']: event for event in plan['events']}
+    
+    crawled = crawl_events_listing(max_pages)
+    for rank, event in enumerate(crawled):
+        # Only completed events are safe to mark done once scraped
+        if event['status'] not in ('completed', 'unknown'):
+            continue
+        
+        existing = planned.get(event['event_id'], {})
+        event['listing_rank'] = rank
+        event['tier1'] = is_tier1_event(event['name'])
+        event['state'] = existing.get('state', 'pending')
+        event['maps'] = existing.get('maps', 0)
+        event['retry_matches'] = existing.get('retry_matches', 0)
+        planned[event['event_id']] = event
+    
+    for event in planned.values():
+        if (event['state'] == 'pending' and not event.get('retry_matches')
+                and os.path.exists(get_event_output_csv(event, output_dir))):
+            event['state'] = 'done'
+    
+    events = sorted(planned.values(), key=lambda e: (not e['tier1'], e['listing_rank']))
+    for priority, event in enumerate(events, 1):
+        event['priority'] = priority
+    
+    plan = {'output_dir': output_dir, 'events': events}
+    save_backfill_plan(plan, plan_path)
+    
+    pending = [e for e in events if e['state'] == 'pending']
+    needs_retry = sum(1 for e in events if e['state'] in ('partial', 'failed'))
+    print(f"\n📋 Backfill plan: {len(events)} events, {len(pending)} pending, "
+          f"{sum(1 for e in pending if e['tier1'])} pending tier-1")
+    if needs_retry:
+        print(f"⚠️ {needs_retry} partial/failed events (re-run --backfill with --retry-failed)")
+    print(f"💾 Saved plan to {plan_path}")
+    
+    return plan
+
+def run_backfill(plan_path=BACKFILL_PLAN_FILE, batch_size=5, request_budget=500, stream=False,
+                 retry_failed=False):
+    """
+    Scrape the next pending events of a backfill plan in priority order
+    Stops after batch_size events or before exceeding request_budget HTTP requests
+    (the first event always runs so one large event cannot stall the plan).
+    The plan is saved after every event, so runs can be resumed at any time.
+    
+    Events with matches that failed or were flagged by batch validation are
+    marked 'partial' and those match URLs are saved next to the output; events
+    with no data are marked 'failed'. With retry_failed=True both are queued
+    again: partial events only re-scrape the listed matches and merge them
+    into the saved data.
+    """
+    plan = load_backfill_plan(plan_path)
+    output_dir = plan.get('output_dir', BACKFILL_OUTPUT_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    if retry_failed:
+        for event in plan['events']:
+            if event['state'] in ('partial', 'failed'):
+                event['state'] = 'pending'
+        save_backfill_plan(plan, plan_path)
+    
+    pending = [e for e in plan['events'] if e['state'] == 'pending']
+    if not pending:
+        print("✅ Backfill complete: no pending events")
+        return plan
+    
+    requests_used = 0
+    events_done = 0
+    
+    for event in pending[:batch_size]:
+        if requests_used >= request_budget:
+            break
+        
+        print(f"\n🎯 [{event['priority']}] {event['name']}")
+        output_prefix = get_event_output_prefix(event, output_dir)
+        retry_urls_file = get_event_retry_urls_file(event, output_dir)
+        match_urls = []
+        
+        # Partial events only need their failed/flagged matches again
+        if (event.get('retry_matches') and os.path.exists(f'{output_prefix}_match_maps.csv')
+                and os.path.exists(retry_urls_file)):
+            match_urls = load_url_queue(retry_urls_file)
+            print(f"🔁 Retrying {len(match_urls)} failed or flagged matches")
+        
+        if not match_urls:
+            match_urls = get_event_match_urls(event['matches_url'])
+            requests_used += 1
+        
+        if requests_used + len(match_urls) > request_budget and events_done > 0:
+            print(f"⏸️ Request budget reached ({requests_used}/{request_budget}), stopping")
+            break
+        
+        failed_urls = []
+        new_maps = scrape_matches(match_urls, stream, failed_urls)
+        requests_used += len(match_urls)
+        
+        event_name = f"{event['event_id']} {event['name']}"
+        df = save_event_data(new_maps, event_name, output_dir, scraped_urls=match_urls)
+        
+        # Matches flagged by batch validation go back into the retry queue too
+        retry_urls = list(failed_urls)
+        rescrape_queue = f'{output_prefix}_rescrape_urls.txt'
+        if df is not None and os.path.exists(rescrape_queue):
+            retry_urls.extend(url for url in load_url_queue(rescrape_queue) if url not in retry_urls)
+        
+        event['maps'] = 0 if df is None else len(df)
+        event['retry_matches'] = len(retry_urls)
+        if retry_urls:
+            save_url_queue(retry_urls, retry_urls_file)
+            print(f"📋 Saved {len(retry_urls)} failed or flagged match URLs to {retry_urls_file}")
+        elif os.path.exists(retry_urls_file):
+            os.remove(retry_urls_file)
+        
+        if df is None:
+            event['state'] = 'failed'
+        elif retry_urls:
+            event['state'] = 'partial'
+        else:
+            event['state'] = 'done'
+        events_done += 1
+        save_backfill_plan(plan, plan_path)
+    
+    states = [e['state'] for e in plan['events']]
+    print(f"\n✅ Backfilled {events_done} events using {requests_used} requests, "
+          f"{states.count('pending')} still pending, {states.count('partial')} partial, "
+          f"{states.count('failed')} failed")
+    
+    return plan
+
+# Shared state for the query service: loaded map data plus a version that
+# changes whenever new scraped rows are picked up from disk
+query_state = {'df': None, 'version': 0, 'signature': None, 'checked_at': 0.0, 'frames': {}}
+query_lock = threading.Lock()
+
+def get_stored_csv_files(data_dirs):
+    """List all saved map CSVs in the given directories"""
+    csv_files = []
+    for data_dir in data_dirs:
+        csv_files.extend(sorted(glob.glob(os.path.join(data_dir, '*_match_maps.csv'))))
+    return csv_files
+
+QUERY_REQUIRED_COLUMNS = ['tournament', 'date', 'team_A', 'team_B', 'map_number', 'map_name',
+                          'winner', 'team_A_won', 'team_B_won', 'url']
+
+def read_query_csv(csv_file):
+    """
+    Read one saved map CSV for the query service
+    Returns: DataFrame, or None (with a warning) if the file can't be used
+    """
+    try:
+        frame = pd.read_csv(csv_file)
+    except (OSError, ValueError) as e:
+        # pd.errors.ParserError and EmptyDataError are ValueErrors
+        print(f"  ⚠️ Skipping unreadable {csv_file}: {e}")
+        return None
+    
+    missing_columns = [col for col in QUERY_REQUIRED_COLUMNS if col not in frame.columns]
+    if missing_columns:
+        print(f"  ⚠️ Skipping {csv_file}: missing columns {', '.join(missing_columns)}")
+        return None
+    
+    return frame
+
+def refresh_query_data(data_dirs, refresh_interval=2.0):
+    """
+    Reload stored map data if any CSV was added or changed
+    Checks the files at most once per refresh_interval seconds. A reload bumps
+    the data version and clears the aggregate cache. Unchanged files are not
+    re-read, and a file that can't be read is skipped (or its last good copy
+    kept) so one bad CSV never takes the service down.
+    """
+    with query_lock:
+        now = time.monotonic()
+        if query_state['df'] is not None and now - query_state['checked_at'] < refresh_interval:
+            return
+        query_state['checked_at'] = now
+        
+        csv_files = get_stored_csv_files(data_dirs)
+        signature = []
+        for csv_file in csv_files:
+            try:
+                stat = os.stat(csv_file)
+            except OSError:
+                continue
+            signature.append((csv_file, stat.st_mtime_ns, stat.st_size))
+        signature = tuple(signature)
+        
+        if signature == query_state['signature']:
+            return
+        
+        frames = []
+        loaded_frames = {}
+        for csv_file, mtime_ns, size in signature:
+            cached = query_state['frames'].get(csv_file)
+            if cached and cached[0] == (mtime_ns, size):
+                loaded_frames[csv_file] = cached
+            else:
+                frame = read_query_csv(csv_file)
+                if frame is not None:
+                    loaded_frames[csv_file] = ((mtime_ns, size), frame)
+                elif cached:
+                    # Keep serving the last good copy of this file
+                    print(f"  ⚠️ Keeping previously loaded data for {csv_file}")
+                    loaded_frames[csv_file] = cached
+            
+            if csv_file in loaded_frames:
+                frames.append(loaded_frames[csv_file][1])
+        
+        if frames:
+            df = pd.concat(frames, ignore_index=True).drop_duplicates(['url', 'map_number'], keep='last')
+        else:
+            df = pd.DataFrame(columns=['tournament', 'match_type', 'date', 'team_A', 'team_B',
+                                       'map_number', 'map_name', 'team_A_score', 'team_B_score',
+                                       'winner', 'team_A_won', 'team_B_won', 'url'])
+        
+        query_state['df'] = df
+        query_state['signature'] = signature
+        query_state['frames'] = loaded_frames
+        query_state['version'] += 1
+        run_cached_query.cache_clear()
+        print(f"🔄 Loaded {len(df)} maps from {len(signature)} files (data version {query_state['version']})")
+
+def query_team_records(df, params):
+    """Team map records, optionally for a single team"""
+    return {'teams': compute_team_records(df, params.get('team') or None)}
+
+def query_map_win_rates(df, params):
+    """Map win rates per team and map, optionally filtered by team and/or map"""
+    team_maps = get_team_sides(df)
+    
+    if params.get('team'):
+        team_maps = team_maps[team_maps['team'] == params['team']]
+    if params.get('map'):
+        team_maps = team_maps[team_maps['map_name'].str.lower() == params['map'].lower()]
+    
+    rates = team_maps.groupby(['team', 'map_name'])['won'].agg(played='count', won='sum').reset_index()
+    rates['win_rate'] = (rates['won'] / rates['played'] * 100).round(1)
+    rates = rates.sort_values(['team', 'played'], ascending=[True, False])
+    return {'map_win_rates': to_records(rates)}
+
+def query_head_to_head(df, params):
+    """Head-to-head results between two teams, overall, per map and per match"""
+    team_a = params.get('team_a')
+    team_b = params.get('team_b')
+    if not team_a or not team_b:
+        raise ValueError("team_a and team_b are required")
+    
+    games = df[((df['team_A'] == team_a) & (df['team_B'] == team_b)) |
+               ((df['team_A'] == team_b) & (df['team_B'] == team_a))]
+    games = games.assign(a_won=(games['winner'] == team_a).astype(int),
+                         b_won=(games['winner'] == team_b).astype(int))
+    
+    per_map = games.groupby('map_name').agg(played=('a_won', 'count'),
+                                            team_a_won=('a_won', 'sum'),
+                                            team_b_won=('b_won', 'sum')).reset_index()
+    per_match = games.groupby('url', sort=False).agg(tournament=('tournament', 'first'),
+                                                    date=('date', 'first'),
+                                                    team_a_maps=('a_won', 'sum'),
+                                                    team_b_maps=('b_won', 'sum')).reset_index()
+    
+    return {
+        'team_a': team_a,
+        'team_b': team_b,
+        'maps_played': len(games),
+        'team_a_maps_won': int(games['a_won'].sum()),
+        'team_b_maps_won': int(games['b_won'].sum()),
+        'maps': to_records(per_map),
+        'matches': to_records(per_match),
+    }
+
+QUERY_ENDPOINTS = {
+    '/teams': query_team_records,
+    '/maps': query_map_win_rates,
+    '/h2h': query_head_to_head,
+}
+
+def to_json_value(value):
+    """json.dumps fallback for numpy/pandas scalars"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+@functools.lru_cache(maxsize=256)
+def run_cached_query(version, path, params):
+    """
+    Run a query endpoint and return the encoded JSON response
+    Memoized per data version, so repeated queries skip aggregation entirely
+    """
+    df = query_state['df']
+    result = QUERY_ENDPOINTS[path](df, dict(params))
+    result['data_version'] = version
+    try:
+        # allow_nan=False: a bare NaN is not valid JSON, so fail loudly instead
+        return json.dumps(result, default=to_json_value, allow_nan=False).encode('utf-8')
+    except ValueError as e:
+        # Not a bad request, so don't let the handler report it as a 400
+        raise RuntimeError(f"Non-JSON value in {path} response: {e}")
+
+def make_query_handler(data_dirs, refresh_interval):
+    """Build the HTTP request handler for the query service"""
+    
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            refresh_query_data(data_dirs, refresh_interval)
+            
+            if parsed.path == '/health':
+                cache_info = run_cached_query.cache_info()
+                body = json.dumps({
+                    'maps': len(query_state['df']),
+                    'data_version': query_state['version'],
+                    'cache_hits': cache_info.hits,
+                    'cache_misses': cache_info.misses,
+                }).encode('utf-8')
+                return self.send_json(200, body)
+            
+            if parsed.path not in QUERY_ENDPOINTS:
+                return self.send_json(404, json.dumps({'error': f"Unknown endpoint {parsed.path}"}).encode('utf-8'))
+            
+            params = tuple(sorted(parse_qsl(parsed.query)))
+            try:
+                body = run_cached_query(query_state['version'], parsed.path, params)
+            except ValueError as e:
+                return self.send_json(400, json.dumps({'error': str(e)}).encode('utf-8'))
+            except Exception as e:
+                print(f"❌ Error serving {self.path}: {e}")
+                return self.send_json(500, json.dumps({'error': 'Internal error'}).encode('utf-8'))
+            
+            self.send_json(200, body)
+        
+        def send_json(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            # Keep the console quiet; dashboards poll frequently
+            pass
+    
+    return QueryHandler
+
+def serve_queries(data_dirs, host='127.0.0.1', port=8000, refresh_interval=2.0):
+    """
+    Serve team records, map win rates and head-to-head results over HTTP
+    Endpoints: /teams[?team=], /maps[?team=&map=], /h2h?team_a=&team_b=, /health
+    """
+    refresh_query_data(data_dirs, refresh_interval)
+    server = ThreadingHTTPServer((host, port), make_query_handler(data_dirs, refresh_interval))
+    print(f"🚀 Query service running on http://{host}:{port} (data: {', '.join(data_dirs)})")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down query service")
+    finally:
+        server.server_close()
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="VLR.gg Match Data Extractor")
+    parser.add_argument('--validate', metavar='CSV',
+                        help="Run batch validation over a saved map CSV and exit")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the run (CPU, allocations, collapsed stacks)")
+    parser.add_argument('--replay', nargs='*', metavar='PATH',
+                        help=f"Re-parse saved match pages instead of scraping (default: {PAGES_DIR})")
+    parser.add_argument('--rebuild', metavar='EVENT_NAME',
+                        help="Rebuild CSV/Excel output from stored pages, with no network requests")
+    parser.add_argument('--url-file', metavar='PATH',
+                        help="Match URLs (one per line) to rebuild; required with --rebuild")
+    parser.add_argument('--profile-output', default='profile', metavar='PREFIX',
+                        help="File name prefix for profile output (default: profile)")
+    parser.add_argument('--plan-backfill', action='store_true',
+                        help="Crawl the VLR.gg events listing and build/update the backfill plan")
+    parser.add_argument('--backfill', action='store_true',
+                        help="Scrape the next batch of pending events from the backfill plan")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="With --backfill: queue partial and failed events again")
+    parser.add_argument('--plan-file', default=BACKFILL_PLAN_FILE, metavar='PATH',
+                        help=f"Backfill plan location (default: {BACKFILL_PLAN_FILE})")
+    parser.add_argument('--pages', type=int, default=10,
+                        help="Events listing pages to crawl when planning (default: 10)")
+    parser.add_argument('--batch-size', type=int, default=5,
+                        help="Maximum events per backfill run (default: 5)")
+    parser.add_argument('--request-budget', type=int, default=500,
+                        help="Maximum HTTP requests per backfill run (default: 500)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Stream match pages and stop downloading once map stats are parsed")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run the local HTTP query service over saved map CSVs")
+    parser.add_argument('--port', type=int, default=8000,
+                        help="Query service port (default: 8000)")
+    parser.add_argument('--data-dir', nargs='+', default=['.', BACKFILL_OUTPUT_DIR], metavar='DIR',
+                        help=f"Directories with saved map CSVs (default: . {BACKFILL_OUTPUT_DIR})")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main() 
+    args = parse_args()
+    
+    if args.validate:
+        validate_csv(args.validate)
+    else:
+        if args.replay is not None:
+            target = lambda: replay_cached_pages(args.replay)
+        elif args.rebuild:
+            if not args.url_file:
+                print("❌ --rebuild needs --url-file with the event's match URLs")
+                sys.exit(1)
+            target = lambda: rebuild_from_saved_pages(args.rebuild, args.url_file)
+        elif args.plan_backfill:
+            target = lambda: build_backfill_plan(args.pages, args.plan_file)
+        elif args.backfill:
+            target = lambda: run_backfill(args.plan_file, args.batch_size, args.request_budget, args.stream,
+                                          args.retry_failed)
+        elif args.serve:
+            target = lambda: serve_queries(args.data_dir, port=args.port)
+        else:
+            target = lambda: main(args.stream)
+        
+        if args.profile:
+            run_with_profiling(target, args.profile_output)
+        else:
+            target()